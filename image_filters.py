@@ -0,0 +1,281 @@
+"""
+Image Filters - Custom kernel filter engine for the Pillow Image Editor
+=======================================================================
+
+Pillow's ImageFilter.Kernel only accepts 3x3 and 5x5 kernels, so this
+module runs custom kernels through NumPy instead. convolve() picks the
+cheapest strategy for the kernel it is given:
+
+- separable kernels are applied as two 1D passes
+- very large non-separable kernels are convolved with an FFT
+- everything else uses a direct sliding window
+
+Box blur, Gaussian blur, unsharp mask and median use Pillow's C filters,
+which have no size limit and beat any NumPy equivalent. Pillow's blurs
+reject 16-bit, 32-bit and float images, so for those modes box blurs use an
+integral image (summed-area table) and Gaussian blurs a cascade of box blurs.
+
+All filters take a PIL image and return a new PIL image. 8-bit images and
+the single-channel 'I;16', 'I' and 'F' modes keep their mode and value
+range. Bilevel ('1') images come back as 'L', and palette and other modes
+come back as 'RGB' or 'RGBA'.
+"""
+
+import math
+from PIL import Image, ImageFilter
+import numpy as np
+
+# Modes that map directly onto an 8-bit (height, width, channels) array
+ARRAY_MODES = ['L', 'LA', 'RGB', 'RGBA', 'CMYK']
+
+# Single-channel modes filtered at their own depth: mode -> (dtype, min, max)
+DEEP_MODES = {
+    'I;16': (np.uint16, 0, 65535),
+    'I': (np.int32, -2 ** 31, 2 ** 31 - 1),
+    'F': (np.float32, None, None),
+}
+
+# Kernels with more taps per pixel than this are convolved with an FFT
+FFT_TAP_THRESHOLD = 64
+
+# Number of box blurs used to approximate a Gaussian
+BOX_CASCADE_PASSES = 3
+
+
+def _to_array_mode(image):
+    """Convert bilevel images to L, and palette and other modes to RGB or RGBA"""
+    if image.mode in ARRAY_MODES or image.mode in DEEP_MODES:
+        return image
+    if image.mode == '1':
+        return image.convert('L')
+    has_alpha = 'A' in image.mode or 'transparency' in image.info
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def _to_array(image):
+    """Convert a PIL image to a float (height, width, channels) array"""
+    image = _to_array_mode(image)
+    # float32 holds every 8-bit, 16-bit and float value; 32-bit integers need float64
+    arr = np.asarray(image, dtype=np.float64 if image.mode == 'I' else np.float32)
+    if arr.ndim == 2:
+        arr = arr[:, :, np.newaxis]
+    return arr, image.mode
+
+
+def _to_image(arr, mode):
+    """Convert a float (height, width, channels) array back to a PIL image"""
+    dtype, low, high = DEEP_MODES.get(mode, (np.uint8, 0, 255))
+    if low is not None:
+        # The array is always a fresh filter result, so round it in place
+        np.rint(arr, out=arr)
+        np.clip(arr, low, high, out=arr)
+    arr = arr.astype(dtype)
+    if arr.shape[2] == 1:
+        arr = arr[:, :, 0]
+    if mode in DEEP_MODES:
+        # Pillow infers these modes from the array dtype
+        return Image.fromarray(arr)
+    return Image.fromarray(arr, mode)
+
+
+def _correlate_axis(arr, kernel, axis):
+    """Slide a 1D kernel along one axis of the array"""
+    size = len(kernel)
+    before = size // 2
+    pad = [(0, 0)] * arr.ndim
+    pad[axis] = (before, size - 1 - before)
+    padded = np.pad(arr, pad, mode='edge')
+
+    length = arr.shape[axis]
+    window = [slice(None)] * arr.ndim
+    out = np.zeros_like(arr)
+    scratch = np.empty_like(arr)
+    for i, weight in enumerate(kernel):
+        if weight:
+            window[axis] = slice(i, i + length)
+            out += np.multiply(padded[tuple(window)], arr.dtype.type(weight), out=scratch)
+    return out
+
+
+def _correlate_direct(arr, kernel):
+    """Slide a 2D kernel over the array one tap at a time"""
+    kh, kw = kernel.shape
+    top, left = kh // 2, kw // 2
+    padded = np.pad(arr, ((top, kh - 1 - top), (left, kw - 1 - left), (0, 0)), mode='edge')
+
+    height, width = arr.shape[:2]
+    out = np.zeros_like(arr)
+    scratch = np.empty_like(arr)
+    for y in range(kh):
+        for x in range(kw):
+            if kernel[y, x]:
+                out += np.multiply(padded[y:y + height, x:x + width], arr.dtype.type(kernel[y, x]), out=scratch)
+    return out
+
+
+def _correlate_fft(arr, kernel):
+    """Correlate the array with a 2D kernel using an FFT"""
+    kh, kw = kernel.shape
+    top, left = kh // 2, kw // 2
+    padded = np.pad(arr, ((top, kh - 1 - top), (left, kw - 1 - left), (0, 0)), mode='edge')
+
+    # Correlation is convolution with the kernel flipped. Channels are
+    # transformed one at a time to keep only one spectrum in memory.
+    shape = padded.shape[:2]
+    kernel_spectrum = np.fft.rfft2(kernel[::-1, ::-1], s=shape).astype(np.result_type(arr.dtype, np.complex64))
+    height, width = arr.shape[:2]
+    out = np.empty_like(arr)
+    for channel in range(arr.shape[2]):
+        spectrum = np.fft.rfft2(padded[:, :, channel]) * kernel_spectrum
+        full = np.fft.irfft2(spectrum, s=shape)
+        out[:, :, channel] = full[kh - 1:kh - 1 + height, kw - 1:kw - 1 + width]
+    return out
+
+
+def _separate(kernel, tolerance=1e-6):
+    """Split a rank-1 kernel into column and row vectors, or return None"""
+    if kernel.shape[0] == 1:
+        return np.ones(1), kernel[0]
+    if kernel.shape[1] == 1:
+        return kernel[:, 0], np.ones(1)
+
+    u, s, vt = np.linalg.svd(kernel)
+    if s[0] == 0 or s[1] > tolerance * s[0]:
+        return None
+    scale = math.sqrt(s[0])
+    return u[:, 0] * scale, vt[0] * scale
+
+
+def _correlate(arr, kernel):
+    """Correlate the array with a 2D kernel using the cheapest strategy"""
+    parts = _separate(kernel)
+    if parts is not None:
+        column, row = parts
+        if len(column) + len(row) <= FFT_TAP_THRESHOLD:
+            return _correlate_axis(_correlate_axis(arr, column, 0), row, 1)
+    elif kernel.size <= FFT_TAP_THRESHOLD:
+        return _correlate_direct(arr, kernel)
+    return _correlate_fft(arr, kernel)
+
+
+def _box_mean(arr, radius):
+    """Average each pixel over a (2r+1) square window using an integral image"""
+    size = 2 * radius + 1
+    padded = np.pad(arr, ((radius, radius), (radius, radius), (0, 0)), mode='edge')
+
+    # Summed-area table with a leading row and column of zeros, kept in
+    # float64 since the sums outgrow float32 precision on large images
+    table = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1, arr.shape[2]))
+    np.cumsum(padded, axis=0, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+
+    height, width = arr.shape[:2]
+    total = (table[size:size + height, size:size + width]
+             - table[:height, size:size + width]
+             - table[size:size + height, :width]
+             + table[:height, :width])
+    return (total / (size * size)).astype(arr.dtype)
+
+
+def _box_cascade_radii(radius, passes=BOX_CASCADE_PASSES):
+    """Box radii whose repeated application approximates a Gaussian"""
+    ideal = math.sqrt(12 * radius * radius / passes + 1)
+    lower = int(math.floor(ideal))
+    if lower % 2 == 0:
+        lower -= 1
+    upper = lower + 2
+    count = round((12 * radius * radius - passes * lower * lower - 4 * passes * lower - 3 * passes)
+                  / (-4 * lower - 4))
+    sizes = [lower if i < count else upper for i in range(passes)]
+    return [(size - 1) // 2 for size in sizes]
+
+
+def _gaussian(arr, radius):
+    """Gaussian blur an array with a cascade of box blurs"""
+    for box_radius in _box_cascade_radii(radius):
+        arr = _box_mean(arr, box_radius)
+    return arr
+
+
+def convolve(image, kernel, scale=None, offset=0):
+    """Apply an arbitrary 2D kernel to the image
+
+    Like ImageFilter.Kernel, each result is divided by scale (the kernel sum
+    by default) and offset is added, but the kernel may be any size.
+    """
+    kernel = np.asarray(kernel, dtype=np.float64)
+    if kernel.ndim == 1:
+        kernel = kernel[np.newaxis, :]
+    if kernel.ndim != 2 or kernel.size == 0:
+        raise ValueError("Kernel must be a non-empty 1D or 2D sequence")
+
+    if scale is None:
+        scale = kernel.sum() or 1
+    arr, mode = _to_array(image)
+    result = _correlate(arr, kernel / scale)
+    if offset:
+        result += offset
+    return _to_image(result, mode)
+
+
+def box_blur(image, radius=1):
+    """Blur the image by averaging over a square box of the given radius"""
+    radius = int(radius)
+    if radius <= 0:
+        return image.copy()
+    image = _to_array_mode(image)
+    if image.mode in ARRAY_MODES:
+        return image.filter(ImageFilter.BoxBlur(radius))
+    arr, mode = _to_array(image)
+    return _to_image(_box_mean(arr, radius), mode)
+
+
+def gaussian_blur(image, radius=2):
+    """Blur the image with a Gaussian of standard deviation radius"""
+    if radius <= 0:
+        return image.copy()
+    image = _to_array_mode(image)
+    if image.mode in ARRAY_MODES:
+        return image.filter(ImageFilter.GaussianBlur(radius))
+    arr, mode = _to_array(image)
+    return _to_image(_gaussian(arr, radius), mode)
+
+
+def unsharp_mask(image, radius=2, percent=150, threshold=3):
+    """Sharpen the image by adding back the difference from a Gaussian blur
+
+    Only differences of at least threshold levels are sharpened.
+    """
+    image = _to_array_mode(image)
+    if image.mode in ARRAY_MODES:
+        return image.filter(ImageFilter.UnsharpMask(radius, percent, threshold))
+    arr, mode = _to_array(image)
+    if radius <= 0:
+        return _to_image(arr, mode)
+    detail = arr - _gaussian(arr, radius)
+    detail[np.abs(detail) < threshold] = 0
+    return _to_image(arr + detail * (percent / 100), mode)
+
+
+def median_filter(image, size=3):
+    """Replace each pixel with the median of a size x size window"""
+    size = int(size)
+    if size <= 1:
+        return image.copy()
+    if size % 2 == 0:
+        size += 1
+    # Pillow's rank filter runs in C and beats any NumPy equivalent, but
+    # does not accept 16-bit images, so those are filtered as 32-bit
+    if image.mode == 'I;16':
+        return image.convert('I').filter(ImageFilter.MedianFilter(size)).convert('I;16')
+    return _to_array_mode(image).filter(ImageFilter.MedianFilter(size))
+
+
+# Custom filters available through PillowImageEditor.apply_filter
+FILTERS = {
+    'box_blur': box_blur,
+    'convolve': convolve,
+    'gaussian_blur': gaussian_blur,
+    'median': median_filter,
+    'unsharp_mask': unsharp_mask,
+}
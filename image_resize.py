@@ -0,0 +1,210 @@
+"""
+Image Resize - Resize engine for the Pillow Image Editor
+========================================================
+
+A plain image.resize() uses one resample filter for every scale and runs
+the whole filter over the full-size source, so big downscales are slow and
+can alias. This module instead:
+
+- picks the resample filter from the scale factor
+- shrinks large ratios in stages, using Pillow's reducing_gap to run the
+  integer box reduce() before a final filtered resize
+- asks JPEG decoders to decode straight at a reduced size (draft mode)
+- supports stretch, fit, fill and cover with a focal point
+- resizes batches of images into one preallocated NumPy buffer
+"""
+
+from PIL import Image
+import numpy as np
+
+# Resize methods supported by resize()
+METHODS = ['stretch', 'fit', 'fill', 'cover']
+
+# Methods whose output is always exactly the requested size
+EXACT_METHODS = ['stretch', 'fill', 'cover']
+
+# Keep at least this many times the target size before the final resize,
+# so the filtered pass still has enough source pixels to antialias
+REDUCING_GAP = 2.0
+
+# Modes that fill() can pad with a background colour directly
+PAD_MODES = ['L', 'LA', 'RGB', 'RGBA', 'CMYK', 'I;16', 'I', 'F']
+
+# 8-bit modes that resize_batch() can store in a uint8 array
+BATCH_MODES = ['L', 'LA', 'RGB', 'RGBA', 'CMYK']
+
+# Modes that can only be resized with nearest-neighbour sampling
+NEAREST_MODES = ['1', 'P']
+
+
+def choose_resample(src_size, dst_size, mode='RGB'):
+    """Pick a resample filter for scaling src_size to dst_size"""
+    if mode in NEAREST_MODES:
+        return Image.NEAREST
+
+    scale = min(dst_size[0] / src_size[0], dst_size[1] / src_size[1])
+    if scale >= 0.5:
+        # Enlarging or mild shrinking: bicubic is smooth without Lanczos ringing
+        return Image.BICUBIC
+    # Strong reductions keep more detail with Lanczos
+    return Image.LANCZOS
+
+
+def has_alpha(image):
+    """Return True if the image has an alpha band or a transparent colour"""
+    # LAB has an 'A' band that is a colour channel, not alpha
+    bands = image.getbands() if image.mode != 'LAB' else ()
+    return 'A' in bands or 'a' in bands or 'transparency' in image.info
+
+
+def _pad_mode(image):
+    """Mode fill() pads the image in, keeping its alpha band if it has one"""
+    if image.mode in PAD_MODES:
+        return image.mode
+    if image.mode == '1':
+        return 'L'
+    if image.mode == 'La':
+        return 'LA'
+    return 'RGBA' if has_alpha(image) else 'RGB'
+
+
+def _fit_size(src_size, box_size):
+    """Largest size with the source aspect ratio that fits inside box_size"""
+    scale = min(box_size[0] / src_size[0], box_size[1] / src_size[1])
+    return (max(1, round(src_size[0] * scale)), max(1, round(src_size[1] * scale)))
+
+
+def _cover_box(src_size, dst_size, focal_point):
+    """Crop box in the source with the target aspect ratio, centred on focal_point"""
+    src_w, src_h = src_size
+    scale = max(dst_size[0] / src_w, dst_size[1] / src_h)
+    crop_w = min(src_w, dst_size[0] / scale)
+    crop_h = min(src_h, dst_size[1] / scale)
+
+    # Centre the crop on the focal point, then slide it back inside the image
+    left = min(max(focal_point[0] * src_w - crop_w / 2, 0), src_w - crop_w)
+    top = min(max(focal_point[1] * src_h - crop_h / 2, 0), src_h - crop_h)
+    return (left, top, left + crop_w, top + crop_h)
+
+
+def _scaled_resize(image, size, box=None, resample=None, reducing_gap=REDUCING_GAP):
+    """Resize the box region of image to size, reducing in stages"""
+    if box is None:
+        box = (0, 0, image.width, image.height)
+    if resample is None:
+        resample = choose_resample((box[2] - box[0], box[3] - box[1]), size, image.mode)
+
+    # Pillow reduces by whole factors first, leaving reducing_gap times the
+    # target size for the filtered pass. reduce() rejects 16-bit modes, so
+    # those get a single filtered resize.
+    if image.mode.startswith('I;16'):
+        reducing_gap = None
+    return image.resize(size, resample, box=box, reducing_gap=reducing_gap)
+
+
+def resize(image, size, method='stretch', focal_point=(0.5, 0.5), background=(255, 255, 255),
+           resample=None):
+    """Resize the image to size using one of METHODS
+
+    - stretch: exactly size, ignoring the aspect ratio
+    - fit: as large as possible inside size, keeping the aspect ratio
+    - fill: fit, then padded with background to exactly size
+    - cover: exactly size, cropping around focal_point to keep the aspect ratio
+
+    focal_point is given as fractions of the width and height, so (0.5, 0.5)
+    is the centre. resample overrides the automatic filter choice.
+    """
+    method = method.lower()
+    if method not in METHODS:
+        raise ValueError(f"Unknown resize method '{method}'. Available methods: {', '.join(METHODS)}")
+    size = (int(size[0]), int(size[1]))
+    if size[0] <= 0 or size[1] <= 0:
+        raise ValueError("Width and height must be positive")
+
+    if method == 'stretch':
+        return _scaled_resize(image, size, resample=resample)
+    if method == 'cover':
+        box = _cover_box(image.size, size, focal_point)
+        return _scaled_resize(image, size, box=box, resample=resample)
+
+    fitted = _scaled_resize(image, _fit_size(image.size, size), resample=resample)
+    if method == 'fit':
+        return fitted
+
+    pad_mode = _pad_mode(fitted)
+    if fitted.mode != pad_mode:
+        fitted = fitted.convert(pad_mode)
+    if pad_mode in ('L', 'LA', 'I', 'F'):
+        background = (background[0],)
+    elif pad_mode == 'I;16':
+        # Scale the 8-bit background level to the 16-bit range
+        background = (background[0] * 257,)
+    elif pad_mode == 'CMYK':
+        background = Image.new('RGB', (1, 1), tuple(background[:3])).convert('CMYK').getpixel((0, 0))
+    else:
+        background = tuple(background[:3])
+    if 'A' in pad_mode:
+        # Padding is transparent where the image has an alpha channel
+        background = background + (0,)
+    canvas = Image.new(pad_mode, size, background if len(background) > 1 else background[0])
+    canvas.paste(fitted, ((size[0] - fitted.width) // 2, (size[1] - fitted.height) // 2))
+    return canvas
+
+
+def open_for_resize(filepath, size, reducing_gap=REDUCING_GAP):
+    """Open an image, letting JPEG decoders skip detail finer than size needs"""
+    image = Image.open(filepath)
+    if image.format == 'JPEG':
+        image.draft(image.mode, (int(size[0] * reducing_gap), int(size[1] * reducing_gap)))
+    return image
+
+
+def _convert(image, mode):
+    """Convert the image to mode, going through LA for premultiplied La"""
+    if image.mode == 'La':
+        image = image.convert('LA')
+    return image.convert(mode) if image.mode != mode else image
+
+
+def source_has_alpha(source):
+    """has_alpha() for a PIL image or an image file, reading only the file header"""
+    if isinstance(source, Image.Image):
+        return has_alpha(source)
+    with Image.open(source) as image:
+        return has_alpha(image)
+
+
+def resize_batch(images, size, method='cover', mode=None, focal_point=(0.5, 0.5),
+                 background=(255, 255, 255), out=None):
+    """Resize many images to the same size into one preallocated array
+
+    images may hold PIL images or file paths. The result is a uint8 array
+    of shape (count, height, width, channels), so mode must be one of
+    BATCH_MODES. By default it is 'RGBA' if any image has transparency and
+    'RGB' otherwise. Pass the result back as out to reuse the buffer for the
+    next batch. Only methods in EXACT_METHODS are allowed, since every slot
+    must be exactly size.
+    """
+    if method.lower() not in EXACT_METHODS:
+        raise ValueError(f"Batch resize needs a fixed output size. Use one of: {', '.join(EXACT_METHODS)}")
+    if mode is None:
+        mode = 'RGBA' if any(source_has_alpha(source) for source in images) else 'RGB'
+    if mode not in BATCH_MODES:
+        raise ValueError(f"Batch resize needs an 8-bit mode. Use one of: {', '.join(BATCH_MODES)}")
+    size = (int(size[0]), int(size[1]))
+
+    channels = len(Image.new(mode, (1, 1)).getbands())
+    shape = (len(images), size[1], size[0], channels)
+    if out is None:
+        out = np.empty(shape, dtype=np.uint8)
+    elif out.shape[0] < len(images) or out.shape[1:] != shape[1:] or out.dtype != np.uint8:
+        raise ValueError(f"Output buffer must be uint8 with shape at least {shape}")
+
+    for i, source in enumerate(images):
+        if isinstance(source, Image.Image):
+            resized = resize(_convert(source, mode), size, method, focal_point, background)
+        else:
+            with open_for_resize(source, size) as opened:
+                resized = resize(_convert(opened, mode), size, method, focal_point, background)
+        out[i] = np.asarray(resized).reshape(shape[1:])
+    return out[:len(images)]
@@ -13,17 +13,30 @@ import os
 import sys
 from PIL import Image, ImageEnhance, ImageFilter, ImageDraw, ImageFont
 import numpy as np
+import image_filters
+import image_resize
 
 class PillowImageEditor:
     """A simple image editor class using Pillow library"""
     
-    def __init__(self):
-        """Initialize the image editor"""
+    def __init__(self, raise_errors=False):
+        """Initialize the image editor
+
+        With raise_errors, failed operations raise RuntimeError instead of
+        printing the error, so scripted callers can tell that a step failed.
+        """
+        self.raise_errors = raise_errors
         self.image = None
         self.original_image = None
         self.filename = None
         self.supported_formats = ['.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff']
         
+    def _report_error(self, message):
+        """Print an error message, or raise it if raise_errors is set"""
+        if self.raise_errors:
+            raise RuntimeError(message)
+        print(message)
+        
     def open_image(self, filepath):
         """Open an image file"""
         try:
@@ -36,7 +49,7 @@ class PillowImageEditor:
             print(f"Image mode: {self.image.mode}")
             return True
         except Exception as e:
-            print(f"Error opening image: {e}")
+            self._report_error(f"Error opening image: {e}")
             return False
             
     def display_image(self):
@@ -44,12 +57,12 @@ class PillowImageEditor:
         if self.image:
             self.image.show()
         else:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             
     def save_image(self, output_path=None):
         """Save the current image"""
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return False
             
         if not output_path:
@@ -62,7 +75,7 @@ class PillowImageEditor:
             print(f"Image saved as {output_path}")
             return True
         except Exception as e:
-            print(f"Error saving image: {e}")
+            self._report_error(f"Error saving image: {e}")
             return False
             
     def reset_image(self):
@@ -71,48 +84,79 @@ class PillowImageEditor:
             self.image = self.original_image.copy()
             print("Image reset to original.")
         else:
-            print("No original image available.")
+            self._report_error("No original image available.")
             
-    def resize_image(self, width, height):
-        """Resize the image to the specified dimensions"""
+    def resize_image(self, width, height, method='stretch', focal_point=(0.5, 0.5)):
+        """Resize the image to the specified dimensions
+
+        method is one of stretch, fit, fill or cover (see image_resize.resize).
+        """
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         try:
-            self.image = self.image.resize((width, height))
-            print(f"Image resized to {width}x{height}")
+            self.image = image_resize.resize(self.image, (width, height), method, focal_point)
+            print(f"Image resized to {self.image.width}x{self.image.height}")
         except Exception as e:
-            print(f"Error resizing image: {e}")
+            self._report_error(f"Error resizing image: {e}")
+            
+    def batch_resize(self, image_paths, width, height, method='cover', output_dir=None, mode=None):
+        """Resize several images to the same size and save them with a "_resized" suffix
+
+        mode defaults to RGBA if any image has transparency, and RGB otherwise.
+        """
+        paths = [path for path in image_paths if os.path.exists(path)]
+        for path in image_paths:
+            if path not in paths:
+                print(f"Image not found: {path}")
+        if not paths:
+            self._report_error("No valid images found.")
+            return
+            
+        try:
+            resized = image_resize.resize_batch(paths, (width, height), method, mode)
+            for path, pixels in zip(paths, resized):
+                image = Image.fromarray(pixels.squeeze(axis=2) if pixels.shape[2] == 1 else pixels)
+                if image.mode in ('LA', 'RGBA') and not image_resize.source_has_alpha(path):
+                    # The batch is RGBA because of other images; this one is
+                    # saved without alpha so formats like JPEG still work
+                    image = image.convert(image.mode[:-1])
+                filename, ext = os.path.splitext(os.path.basename(path))
+                output_path = os.path.join(output_dir or os.path.dirname(path), f"{filename}_resized{ext}")
+                image.save(output_path)
+            print(f"Resized {len(paths)} images to {width}x{height}")
+        except Exception as e:
+            self._report_error(f"Error resizing images: {e}")
             
     def crop_image(self, left, top, right, bottom):
         """Crop the image to the specified coordinates"""
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         try:
             self.image = self.image.crop((left, top, right, bottom))
             print(f"Image cropped to coordinates ({left}, {top}, {right}, {bottom})")
         except Exception as e:
-            print(f"Error cropping image: {e}")
+            self._report_error(f"Error cropping image: {e}")
             
     def rotate_image(self, degrees):
         """Rotate the image by the specified degrees"""
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         try:
             self.image = self.image.rotate(degrees, expand=True)
             print(f"Image rotated by {degrees} degrees")
         except Exception as e:
-            print(f"Error rotating image: {e}")
+            self._report_error(f"Error rotating image: {e}")
             
     def flip_image(self, direction):
         """Flip the image horizontally or vertically"""
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         try:
@@ -123,14 +167,14 @@ class PillowImageEditor:
                 self.image = self.image.transpose(Image.FLIP_TOP_BOTTOM)
                 print("Image flipped vertically")
             else:
-                print("Invalid direction. Use 'horizontal' or 'vertical'.")
+                self._report_error("Invalid direction. Use 'horizontal' or 'vertical'.")
         except Exception as e:
-            print(f"Error flipping image: {e}")
+            self._report_error(f"Error flipping image: {e}")
     
     def adjust_brightness(self, factor):
         """Adjust the brightness of the image"""
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         try:
@@ -138,12 +182,12 @@ class PillowImageEditor:
             self.image = enhancer.enhance(factor)
             print(f"Brightness adjusted by factor of {factor}")
         except Exception as e:
-            print(f"Error adjusting brightness: {e}")
+            self._report_error(f"Error adjusting brightness: {e}")
             
     def adjust_contrast(self, factor):
         """Adjust the contrast of the image"""
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         try:
@@ -151,12 +195,12 @@ class PillowImageEditor:
             self.image = enhancer.enhance(factor)
             print(f"Contrast adjusted by factor of {factor}")
         except Exception as e:
-            print(f"Error adjusting contrast: {e}")
+            self._report_error(f"Error adjusting contrast: {e}")
             
     def adjust_color(self, factor):
         """Adjust the color saturation of the image"""
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         try:
@@ -164,12 +208,12 @@ class PillowImageEditor:
             self.image = enhancer.enhance(factor)
             print(f"Color saturation adjusted by factor of {factor}")
         except Exception as e:
-            print(f"Error adjusting color: {e}")
+            self._report_error(f"Error adjusting color: {e}")
             
     def adjust_sharpness(self, factor):
         """Adjust the sharpness of the image"""
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         try:
@@ -177,12 +221,16 @@ class PillowImageEditor:
             self.image = enhancer.enhance(factor)
             print(f"Sharpness adjusted by factor of {factor}")
         except Exception as e:
-            print(f"Error adjusting sharpness: {e}")
+            self._report_error(f"Error adjusting sharpness: {e}")
     
-    def apply_filter(self, filter_name):
-        """Apply a filter to the image"""
+    def apply_filter(self, filter_name, **params):
+        """Apply a filter to the image
+
+        Custom filters from image_filters accept keyword parameters,
+        e.g. apply_filter('gaussian_blur', radius=10).
+        """
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         filters = {
@@ -195,19 +243,26 @@ class PillowImageEditor:
             'smooth': ImageFilter.SMOOTH
         }
         
-        if filter_name.lower() in filters:
+        name = filter_name.lower()
+        if name in filters and params:
+            self._report_error(f"The {filter_name} filter does not take parameters: {', '.join(params)}")
+        elif name in filters or name in image_filters.FILTERS:
             try:
-                self.image = self.image.filter(filters[filter_name.lower()])
+                if name in filters:
+                    self.image = self.image.filter(filters[name])
+                else:
+                    self.image = image_filters.FILTERS[name](self.image, **params)
                 print(f"Applied {filter_name} filter")
             except Exception as e:
-                print(f"Error applying filter: {e}")
+                self._report_error(f"Error applying filter: {e}")
         else:
-            print(f"Filter not found. Available filters: {', '.join(filters.keys())}")
+            available = list(filters.keys()) + list(image_filters.FILTERS.keys())
+            self._report_error(f"Filter not found. Available filters: {', '.join(available)}")
             
     def convert_mode(self, mode):
         """Convert the image to a different color mode"""
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         modes = ['L', 'RGB', 'RGBA', 'CMYK', '1', 'P']
@@ -217,14 +272,14 @@ class PillowImageEditor:
                 self.image = self.image.convert(mode.upper())
                 print(f"Image converted to {mode.upper()} mode")
             except Exception as e:
-                print(f"Error converting image mode: {e}")
+                self._report_error(f"Error converting image mode: {e}")
         else:
-            print(f"Mode not supported. Available modes: {', '.join(modes)}")
+            self._report_error(f"Mode not supported. Available modes: {', '.join(modes)}")
             
     def add_text(self, text, position, font_size=40, color=(0, 0, 0)):
         """Add text to the image"""
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         try:
@@ -242,12 +297,12 @@ class PillowImageEditor:
             draw.text(position, text, font=font, fill=color)
             print(f"Text added at position {position}")
         except Exception as e:
-            print(f"Error adding text: {e}")
+            self._report_error(f"Error adding text: {e}")
             
     def draw_rectangle(self, coords, outline_color=(0, 0, 0), width=1):
         """Draw a rectangle on the image"""
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         try:
@@ -255,12 +310,12 @@ class PillowImageEditor:
             draw.rectangle(coords, outline=outline_color, width=width)
             print(f"Rectangle drawn at coordinates {coords}")
         except Exception as e:
-            print(f"Error drawing rectangle: {e}")
+            self._report_error(f"Error drawing rectangle: {e}")
             
     def draw_circle(self, center, radius, outline_color=(0, 0, 0), width=1):
         """Draw a circle on the image"""
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         try:
@@ -269,12 +324,12 @@ class PillowImageEditor:
             draw.ellipse(coords, outline=outline_color, width=width)
             print(f"Circle drawn at center {center} with radius {radius}")
         except Exception as e:
-            print(f"Error drawing circle: {e}")
+            self._report_error(f"Error drawing circle: {e}")
     
     def create_thumbnail(self, size=(128, 128)):
         """Create a thumbnail of the image"""
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         try:
@@ -289,12 +344,12 @@ class PillowImageEditor:
             
             print(f"Thumbnail created and saved as {output_path}")
         except Exception as e:
-            print(f"Error creating thumbnail: {e}")
+            self._report_error(f"Error creating thumbnail: {e}")
     
     def create_collage(self, image_paths, cols=2, padding=10):
         """Create a collage from multiple images"""
         if not image_paths:
-            print("No image paths provided.")
+            self._report_error("No image paths provided.")
             return
             
         try:
@@ -308,7 +363,7 @@ class PillowImageEditor:
                     print(f"Image not found: {path}")
             
             if not images:
-                print("No valid images found.")
+                self._report_error("No valid images found.")
                 return
                 
             # Calculate rows needed
@@ -336,12 +391,12 @@ class PillowImageEditor:
             self.filename = "collage.jpg"
             print("Collage created successfully.")
         except Exception as e:
-            print(f"Error creating collage: {e}")
+            self._report_error(f"Error creating collage: {e}")
             
     def convert_format(self, output_format):
         """Convert the image to a different format"""
         if not self.image:
-            print("No image loaded.")
+            self._report_error("No image loaded.")
             return
             
         # Strip the dot if included
@@ -350,7 +405,7 @@ class PillowImageEditor:
             
         # Check if the format is supported
         if f".{output_format.lower()}" not in self.supported_formats:
-            print(f"Format not supported. Supported formats: {', '.join(self.supported_formats)}")
+            self._report_error(f"Format not supported. Supported formats: {', '.join(self.supported_formats)}")
             return
             
         try:
@@ -362,7 +417,7 @@ class PillowImageEditor:
             self.image.save(output_path)
             print(f"Image converted and saved as {output_path}")
         except Exception as e:
-            print(f"Error converting format: {e}")
+            self._report_error(f"Error converting format: {e}")
 
 def show_menu():
     """Display the menu options"""
@@ -418,7 +473,8 @@ def main():
             try:
                 width = int(input("Enter width: "))
                 height = int(input("Enter height: "))
-                editor.resize_image(width, height)
+                method = input("Enter method (stretch/fit/fill/cover, default stretch): ") or "stretch"
+                editor.resize_image(width, height, method)
             except ValueError:
                 print("Invalid dimensions. Please enter integers for width and height.")
                 
@@ -472,9 +528,20 @@ def main():
                 print("Invalid value. Please enter a number.")
                 
         elif choice == '12':
-            print("Available filters: blur, contour, detail, edge_enhance, emboss, sharpen, smooth")
+            print("Available filters: blur, contour, detail, edge_enhance, emboss, sharpen, smooth,")
+            print("                   box_blur, gaussian_blur, median, unsharp_mask")
             filter_name = input("Enter filter name: ")
-            editor.apply_filter(filter_name)
+            try:
+                if filter_name.lower() in ('box_blur', 'gaussian_blur', 'unsharp_mask'):
+                    radius = float(input("Enter radius (default 2): ") or "2")
+                    editor.apply_filter(filter_name, radius=radius)
+                elif filter_name.lower() == 'median':
+                    size = int(input("Enter window size (default 3): ") or "3")
+                    editor.apply_filter(filter_name, size=size)
+                else:
+                    editor.apply_filter(filter_name)
+            except ValueError:
+                print("Invalid value. Please enter a number.")
             
         elif choice == '13':
             editor.convert_mode('L')
@@ -0,0 +1,488 @@
+"""
+Watch Daemon - Watch-folder ingestion for the Pillow Image Editor
+=================================================================
+
+Watches input directories for new or changed images, queues them in a
+SQLite job queue and runs each one through a configured PillowImageEditor
+pipeline on a pool of worker processes.
+
+- Files are queued only once their size and modification time have not
+  changed for poll_interval seconds, so half-copied files are not picked up.
+- A file whose content hash has already been processed with the same
+  pipeline is skipped.
+- Outputs are saved as <name>_<hash>_edited<ext>, where <hash> is the
+  start of the content hash, so files with the same name never collide.
+- Failed jobs are retried with a growing delay. After max_attempts failed
+  attempts the source file is moved to the dead-letter folder.
+- If a worker process dies, the jobs it took down are retried one at a
+  time, so only the job that kills a worker uses up its attempts.
+- Jobs and their state live in SQLite, so after a crash the daemon picks
+  up where it stopped without redoing finished work.
+
+If the optional watchdog package is installed, filesystem events wake the
+daemon early to scan. Otherwise the directories are polled.
+
+Usage:
+    python watch_daemon.py config.json [--once]
+
+Example config.json:
+    {
+        "input_dirs": ["incoming"],
+        "output_dir": "edited",
+        "dead_letter_dir": "failed",
+        "database": "jobs.sqlite3",
+        "workers": 4,
+        "max_attempts": 3,
+        "poll_interval": 2.0,
+        "pipeline": [
+            {"step": "resize_image", "width": 800, "height": 600, "method": "fit"},
+            {"step": "apply_filter", "filter_name": "unsharp_mask", "radius": 2}
+        ]
+    }
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from pillow_image_editor import PillowImageEditor
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+DEFAULT_CONFIG = {
+    'input_dirs': ['incoming'],
+    'output_dir': 'edited',
+    'dead_letter_dir': 'failed',
+    'database': 'jobs.sqlite3',
+    'workers': os.cpu_count() or 1,
+    'max_attempts': 3,
+    'retry_delay': 5.0,
+    'poll_interval': 2.0,
+    'pipeline': [],
+}
+
+# Editor methods that make sense as pipeline steps
+PIPELINE_STEPS = [
+    'resize_image', 'crop_image', 'rotate_image', 'flip_image',
+    'adjust_brightness', 'adjust_contrast', 'adjust_color', 'adjust_sharpness',
+    'apply_filter', 'convert_mode', 'add_text', 'draw_rectangle', 'draw_circle',
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    pipeline_hash TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    output_path TEXT,
+    last_error TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (content_hash, pipeline_hash)
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, available_at);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    content_hash TEXT NOT NULL
+);
+"""
+
+
+def load_config(config_path):
+    """Load a JSON config file on top of DEFAULT_CONFIG and check the pipeline"""
+    with open(config_path) as f:
+        config = dict(DEFAULT_CONFIG, **json.load(f))
+
+    for step in config['pipeline']:
+        if step.get('step') not in PIPELINE_STEPS:
+            raise ValueError(f"Unknown pipeline step {step.get('step')!r}. "
+                             f"Available steps: {', '.join(PIPELINE_STEPS)}")
+    return config
+
+
+def file_hash(filepath, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pipeline_hash(pipeline):
+    """Return a hash identifying the pipeline, so changing it reprocesses files"""
+    return hashlib.sha256(json.dumps(pipeline, sort_keys=True).encode()).hexdigest()
+
+
+def process_file(filepath, pipeline, output_path):
+    """Run one file through the pipeline and save it to output_path
+
+    Runs in a worker process. The editor raises on any failed step, so the
+    job is retried instead of saving a half-edited image. The result is
+    written to a temporary file and renamed into place, so an interrupted
+    job never leaves a partial output.
+    """
+    editor = PillowImageEditor(raise_errors=True)
+    editor.open_image(filepath)
+
+    for step in pipeline:
+        params = {key: value for key, value in step.items() if key != 'step'}
+        getattr(editor, step['step'])(**params)
+
+    filename, ext = os.path.splitext(output_path)
+    temp_path = f"{filename}.partial{ext}"
+    editor.save_image(temp_path)
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+class JobQueue:
+    """Persistent job queue stored in a SQLite database"""
+
+    def __init__(self, database):
+        """Open (or create) the queue database"""
+        self.conn = sqlite3.connect(database)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    def recover(self):
+        """Return jobs left running by a crash to the queue"""
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET status = 'pending', updated_at = ? WHERE status = 'running'",
+                (time.time(),))
+        return cursor.rowcount
+
+    def known_file(self, path, size, mtime):
+        """Return the stored content hash if the file is unchanged, else None"""
+        row = self.conn.execute(
+            'SELECT content_hash FROM files WHERE path = ? AND size = ? AND mtime = ?',
+            (path, size, mtime)).fetchone()
+        return row[0] if row else None
+
+    def enqueue(self, path, size, mtime, content_hash, pipeline_id):
+        """Queue a file unless its content was already processed
+
+        Content that previously went to the dead-letter folder is queued
+        again, since dropping it in a second time means it should be retried.
+        Returns True if a job was queued.
+        """
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO files (path, size, mtime, content_hash) VALUES (?, ?, ?, ?)',
+                (path, size, mtime, content_hash))
+            row = self.conn.execute(
+                'SELECT id, status FROM jobs WHERE content_hash = ? AND pipeline_hash = ?',
+                (content_hash, pipeline_id)).fetchone()
+            if row is None:
+                self.conn.execute(
+                    'INSERT INTO jobs (path, content_hash, pipeline_hash, updated_at) VALUES (?, ?, ?, ?)',
+                    (path, content_hash, pipeline_id, now))
+                return True
+            if row[1] == 'dead':
+                self.conn.execute(
+                    "UPDATE jobs SET path = ?, status = 'pending', attempts = 0, available_at = 0, "
+                    'last_error = NULL, updated_at = ? WHERE id = ?',
+                    (path, now, row[0]))
+                return True
+        return False
+
+    def forget(self, path):
+        """Drop the stored hash for a path, so a file dropped there again is rehashed"""
+        with self.conn:
+            self.conn.execute('DELETE FROM files WHERE path = ?', (path,))
+
+    def claim(self, limit, job_ids=None):
+        """Mark up to limit due jobs as running and return (id, path, content_hash) rows
+
+        If job_ids is given, only those jobs are claimed.
+        """
+        now = time.time()
+        query = "SELECT id, path, content_hash FROM jobs WHERE status = 'pending' AND available_at <= ?"
+        params = [now]
+        if job_ids is not None:
+            query += f" AND id IN ({', '.join('?' * len(job_ids))})"
+            params += list(job_ids)
+        with self.conn:
+            rows = self.conn.execute(query + ' ORDER BY id LIMIT ?', params + [limit]).fetchall()
+            self.conn.executemany(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?",
+                [(now, row[0]) for row in rows])
+        return rows
+
+    def release(self, job_id):
+        """Return a running job to the queue without counting an attempt"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'pending', updated_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def complete(self, job_id, output_path):
+        """Mark a job as done"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'done', output_path = ?, last_error = NULL, updated_at = ? "
+                'WHERE id = ?', (output_path, time.time(), job_id))
+
+    def fail(self, job_id, error, max_attempts, retry_delay):
+        """Record a failed attempt and return True if the job should be dead-lettered
+
+        Attempts are only counted here, so jobs interrupted by a crash or
+        Ctrl-C are not counted as failures.
+        """
+        now = time.time()
+        with self.conn:
+            attempts = self.conn.execute('SELECT attempts FROM jobs WHERE id = ?', (job_id,)).fetchone()[0] + 1
+            dead = attempts >= max_attempts
+            # Wait longer after each failed attempt
+            self.conn.execute(
+                'UPDATE jobs SET status = ?, attempts = ?, available_at = ?, last_error = ?, updated_at = ? '
+                'WHERE id = ?',
+                ('dead' if dead else 'pending', attempts, now + retry_delay * 2 ** (attempts - 1), error, now,
+                 job_id))
+        return dead
+
+    def counts(self):
+        """Return the number of jobs in each status"""
+        return dict(self.conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+    def close(self):
+        """Close the database connection"""
+        self.conn.close()
+
+
+class _WakeHandler(FileSystemEventHandler):
+    """Watchdog handler that wakes the daemon on any filesystem event"""
+
+    def __init__(self, wake):
+        self.wake = wake
+
+    def on_any_event(self, event):
+        self.wake.set()
+
+
+class WatchDaemon:
+    """Watch input directories and process new images through the pipeline"""
+
+    def __init__(self, config):
+        """Set up directories and the job queue from a config dict"""
+        self.config = dict(DEFAULT_CONFIG, **config)
+        self.pipeline_id = pipeline_hash(self.config['pipeline'])
+        self.supported_formats = PillowImageEditor().supported_formats
+        self.queue = JobQueue(self.config['database'])
+        self.wake = threading.Event()
+        self.stopping = False
+        # path -> (size, mtime, first seen time) from the previous scan, to
+        # spot files still being written
+        self.last_seen = {}
+        # Paths that could not be read in the previous scan
+        self.unreadable = set()
+        # Jobs that were running when a worker died, to be retried one at a time
+        self.suspects = set()
+
+        for directory in self.config['input_dirs'] + [self.config['output_dir'], self.config['dead_letter_dir']]:
+            os.makedirs(directory, exist_ok=True)
+
+    def scan(self):
+        """Queue new or changed files whose size and mtime have settled
+
+        A file counts as settled once its size and mtime have not changed
+        for poll_interval seconds. Scans can run milliseconds apart, after
+        a job finishes or a watchdog event, so unchanged across two scans
+        is not enough.
+        """
+        now = time.time()
+        queued = 0
+        seen = {}
+        unreadable = set()
+        for directory in self.config['input_dirs']:
+            for entry in os.scandir(directory):
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                if os.path.splitext(entry.name)[1].lower() not in self.supported_formats:
+                    continue
+
+                stat = entry.stat()
+                path = os.path.abspath(entry.path)
+                previous = self.last_seen.get(path)
+                if previous is None or previous[:2] != (stat.st_size, stat.st_mtime):
+                    seen[path] = (stat.st_size, stat.st_mtime, now)
+                    continue
+                seen[path] = previous
+                if now - previous[2] < self.config['poll_interval']:
+                    continue
+
+                if self.queue.known_file(path, stat.st_size, stat.st_mtime):
+                    continue
+                try:
+                    content_hash = file_hash(path)
+                except OSError as e:
+                    print(f"Error reading {path}: {e}")
+                    unreadable.add(path)
+                    continue
+                if self.queue.enqueue(path, stat.st_size, stat.st_mtime, content_hash, self.pipeline_id):
+                    queued += 1
+        self.last_seen = seen
+        self.unreadable = unreadable
+        return queued
+
+    def output_path(self, path, content_hash):
+        """Return the output path for an input file, using the "_edited" suffix
+
+        A short content hash keeps files with the same name in different
+        input folders, or replaced in the same folder, from overwriting each other.
+        """
+        filename, ext = os.path.splitext(os.path.basename(path))
+        return os.path.join(self.config['output_dir'], f"{filename}_{content_hash[:12]}_edited{ext}")
+
+    def dead_letter(self, path, content_hash, error):
+        """Move a failed file to the dead-letter folder with a note of the error"""
+        if not os.path.exists(path):
+            return
+        filename, ext = os.path.splitext(os.path.basename(path))
+        target = os.path.join(self.config['dead_letter_dir'], f"{filename}_{content_hash[:12]}{ext}")
+        shutil.move(path, target)
+        with open(f"{target}.error.txt", 'w') as f:
+            f.write(f"{error}\n")
+        print(f"Moved {path} to {target}")
+
+    def finish(self, job_id, path, content_hash, future, isolated):
+        """Record the result of a finished job and return True if the pool broke
+
+        When a worker dies, every job in flight fails with BrokenProcessPool.
+        Those jobs are returned to the queue without counting an attempt and
+        retried one at a time, so only a job that breaks the pool on its own
+        is charged for it.
+        """
+        self.suspects.discard(job_id)
+        try:
+            output_path = future.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool) and not isolated:
+                print(f"A worker died while processing {path}; retrying it on its own")
+                self.queue.release(job_id)
+                self.suspects.add(job_id)
+                return True
+            error = f"{type(e).__name__}: {e}"
+            print(f"Error processing {path}: {error}")
+            if self.queue.fail(job_id, error, self.config['max_attempts'], self.config['retry_delay']):
+                self.dead_letter(path, content_hash, error)
+                self.queue.forget(path)
+            return isinstance(e, BrokenProcessPool)
+        self.queue.complete(job_id, output_path)
+        print(f"Processed {path} -> {output_path}")
+        return False
+
+    def run(self, once=False):
+        """Scan and process files until stopped, or until idle if once is True"""
+        recovered = self.queue.recover()
+        if recovered:
+            print(f"Requeued {recovered} interrupted jobs")
+
+        observer = None
+        if Observer is not None and not once:
+            observer = Observer()
+            for directory in self.config['input_dirs']:
+                observer.schedule(_WakeHandler(self.wake), directory)
+            observer.start()
+
+        workers = self.config['workers']
+        executor = ProcessPoolExecutor(max_workers=workers)
+        running = {}
+        try:
+            while not self.stopping:
+                self.scan()
+
+                isolated = bool(self.suspects)
+                if not isolated:
+                    claimed = self.queue.claim(workers - len(running))
+                elif running:
+                    claimed = []
+                else:
+                    claimed = self.queue.claim(1, self.suspects)
+                    if not claimed:
+                        # The suspects are no longer due, so stop isolating them
+                        self.suspects.clear()
+                for job_id, path, content_hash in claimed:
+                    future = executor.submit(process_file, path, self.config['pipeline'],
+                                             self.output_path(path, content_hash))
+                    running[future] = (job_id, path, content_hash, isolated)
+
+                if running:
+                    done, _ = wait(running, timeout=self.config['poll_interval'], return_when=FIRST_COMPLETED)
+                    broken = False
+                    for future in done:
+                        job_id, path, content_hash, isolated = running.pop(future)
+                        broken = self.finish(job_id, path, content_hash, future, isolated) or broken
+                    if broken:
+                        executor.shutdown(cancel_futures=True)
+                        executor = ProcessPoolExecutor(max_workers=workers)
+                    continue
+
+                if once and not self.queue.counts().get('pending') and not self.scan_pending():
+                    break
+                self.wake.wait(self.config['poll_interval'])
+                self.wake.clear()
+        except KeyboardInterrupt:
+            print("Stopping...")
+        finally:
+            # Jobs still running are requeued by recover() on the next start
+            executor.shutdown(wait=False, cancel_futures=True)
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            self.queue.close()
+
+    def scan_pending(self):
+        """Return True if a scanned file is waiting for its size and mtime to settle
+
+        Files that could not be read are left out, so --once does not wait
+        for them forever.
+        """
+        for path, (size, mtime, _) in self.last_seen.items():
+            if path not in self.unreadable and not self.queue.known_file(path, size, mtime):
+                return True
+        return False
+
+    def stop(self):
+        """Ask the run loop to exit after the current iteration"""
+        self.stopping = True
+        self.wake.set()
+
+
+def main():
+    """Run the watch daemon from the command line"""
+    parser = argparse.ArgumentParser(description="Process images dropped into watched folders")
+    parser.add_argument('config', help="path to a JSON config file")
+    parser.add_argument('--once', action='store_true',
+                        help="process what is already there, then exit")
+    args = parser.parse_args()
+
+    try:
+        config = load_config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"Error loading config: {e}")
+        sys.exit(1)
+
+    WatchDaemon(config).run(once=args.once)
+
+
+if __name__ == "__main__":
+    main()